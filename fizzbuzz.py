@@ -1,3 +1,28 @@
+import sys
+
+import numpy as np
+
+# Indexed by the classification codes from _fizzbuzz_codes
+FIZZBUZZ_LABELS = np.array(["", "Fizz", "Buzz", "FizzBuzz"], dtype=object)
+
+
+def _fizzbuzz_codes(n):
+    """
+    Classify 1..n as 0 (number), 1 (Fizz), 2 (Buzz) or 3 (FizzBuzz).
+    
+    Args:
+        n: The upper limit (inclusive) for the FizzBuzz sequence
+        
+    Returns:
+        An int8 array of classification codes
+    """
+    # Strike out every 3rd and 5th value directly instead of testing each with %
+    codes = np.zeros(max(n, 0), dtype=np.int8)
+    codes[2::3] = 1
+    codes[4::5] += 2
+    return codes
+
+
 def fizzbuzz(n):
     """
     Generate FizzBuzz sequence up to n.
@@ -8,17 +33,11 @@ def fizzbuzz(n):
     Returns:
         A list of FizzBuzz values
     """
-    result = []
-    for i in range(1, n + 1):
-        if i % 15 == 0:
-            result.append("FizzBuzz")
-        elif i % 3 == 0:
-            result.append("Fizz")
-        elif i % 5 == 0:
-            result.append("Buzz")
-        else:
-            result.append(i)
-    return result
+    codes = _fizzbuzz_codes(n)
+    result = FIZZBUZZ_LABELS[codes]
+    plain = codes == 0
+    result[plain] = np.flatnonzero(plain) + 1
+    return result.tolist()
 
 
 def print_fizzbuzz(n):
@@ -28,8 +47,8 @@ def print_fizzbuzz(n):
     Args:
         n: The upper limit (inclusive) for the FizzBuzz sequence
     """
-    for value in fizzbuzz(n):
-        print(value)
+    # One write instead of a print (and possible flush) per value
+    sys.stdout.write("".join(f"{value}\n" for value in fizzbuzz(n)))
 
 
 if __name__ == "__main__":
@@ -1,35 +1,177 @@
-def is_prime(n):
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; fall back to plain Python loops
+    prange = range
+
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+SMALL_PRIMES = (2, 3, 5, 7, 11, 13)
+
+# Miller-Rabin with the first 13 primes as bases is exact below this bound (psi_13);
+# at or above it the test is probabilistic
+MILLER_RABIN_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+MILLER_RABIN_EXACT_BOUND = 3317044064679887385961981
+
+# Extra bases used at or above the exact bound, where psi_13 itself would slip through
+MILLER_RABIN_LARGE_BASES = MILLER_RABIN_BASES + (43, 47, 53, 59, 61, 67, 71, 73, 79, 83, 89, 97)
+
+# Miller-Rabin's cost barely grows with n, while trial division grows with sqrt(n)
+MILLER_RABIN_THRESHOLD = 1 << 20
+
+
+@njit("boolean(int64)", cache=True)
+def _is_prime_wheel(n):
     """
-    Check if a number is prime.
+    Check if a number is prime by trial division over a 6k±1 wheel.
     
     Args:
-        n: The number to check
+        n: The number to check (must fit in an int64)
         
     Returns:
         True if n is prime, False otherwise
     """
     if n < 2:
         return False
-    if n == 2:
+    for p in SMALL_PRIMES:
+        if n == p:
+            return True
+        if n % p == 0:
+            return False
+    if n < 17 * 17:
         return True
-    if n % 2 == 0:
-        return False
     
-    # Check odd divisors up to sqrt(n)
-    i = 3
+    # Every remaining prime is 6k-1 or 6k+1, starting from 17 and 19
+    i = 17
     while i * i <= n:
-        if n % i == 0:
+        if n % i == 0 or n % (i + 2) == 0:
+            return False
+        i += 6
+    
+    return True
+
+
+def _miller_rabin(n):
+    """
+    Check if a number is prime with the Miller-Rabin test.
+    Exact for n < MILLER_RABIN_EXACT_BOUND (about 3.3e24); above that a True
+    result means n is a strong probable prime to all MILLER_RABIN_LARGE_BASES.
+    
+    Args:
+        n: The number to check
+        
+    Returns:
+        True if n is prime, False otherwise
+    """
+    bases = MILLER_RABIN_BASES if n < MILLER_RABIN_EXACT_BOUND else MILLER_RABIN_LARGE_BASES
+    for p in bases:
+        if n % p == 0:
+            return n == p
+    
+    # Write n - 1 as d * 2^s with d odd
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    
+    for a in bases:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
             return False
-        i += 2
     
     return True
 
 
+def is_prime(n):
+    """
+    Check if a number is prime.
+    Exact for n < MILLER_RABIN_EXACT_BOUND (about 3.3e24); probabilistic above it.
+    
+    Args:
+        n: The number to check
+        
+    Returns:
+        True if n is prime, False otherwise
+    """
+    # Checked here so arbitrarily large negative numbers never reach the int64 kernel
+    if n < 2:
+        return False
+    if n >= MILLER_RABIN_THRESHOLD:
+        return _miller_rabin(n)
+    return _is_prime_wheel(n)
+
+
+@njit(parallel=True, cache=True)
+def is_prime_batch(numbers):
+    """
+    Check an array of numbers for primality in parallel.
+    Uses trial division for every element, since Miller-Rabin needs
+    arbitrary-precision arithmetic.
+    
+    Args:
+        numbers: An int64 array of numbers to check
+        
+    Returns:
+        A boolean array, True where the number is prime
+    """
+    result = np.empty(len(numbers), dtype=np.bool_)
+    for idx in prange(len(numbers)):
+        result[idx] = _is_prime_wheel(numbers[idx])
+    return result
+
+
+def sieve(limit):
+    """
+    Sieve of Eratosthenes up to limit.
+    
+    Args:
+        limit: The upper bound (inclusive) of the sieve
+        
+    Returns:
+        A boolean array where index i is True if i is prime
+    """
+    primes = np.ones(limit + 1, dtype=bool)
+    primes[:2] = False
+    for i in range(2, int(limit ** 0.5) + 1):
+        if primes[i]:
+            primes[i * i::i] = False
+    return primes
+
+
+def is_prime_many(numbers):
+    """
+    Check many numbers for primality with one shared sieve.
+    Best when the numbers are bounded, since the sieve needs max(numbers) bytes.
+    
+    Args:
+        numbers: An array-like of integers to check
+        
+    Returns:
+        A boolean array, True where the number is prime
+    """
+    numbers = np.asarray(numbers, dtype=np.int64)
+    if numbers.size == 0:
+        return np.zeros(numbers.shape, dtype=bool)
+    primes = sieve(max(int(numbers.max()), 1))
+    return primes[np.clip(numbers, 0, None)]
+
+
 if __name__ == "__main__":
     # Test with some numbers
     test_numbers = [1, 2, 3, 4, 5, 10, 11, 17, 20, 23, 29, 100, 101]
     
-    for num in test_numbers:
-        result = "prime" if is_prime(num) else "not prime"
+    for num, prime in zip(test_numbers, is_prime_many(test_numbers)):
+        result = "prime" if prime else "not prime"
         print(f"{num} is {result}")
 
@@ -1,7 +1,21 @@
-import json
+import asyncio
+import atexit
+import difflib
+import gzip
+import hashlib
+import itertools
 import os
+import random
 import re
-import requests
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+import orjson
+from markdown_it import MarkdownIt
 from openai import OpenAI
 
 # Environment variables
@@ -18,20 +32,229 @@ NOTION_HDRS = {
     "Content-Type": "application/json",
 }
 
+NOTION_TIMEOUT = 30.0  # seconds
+
+# Notion allows ~3 requests/second, so keep concurrent requests at or below that
+NOTION_CONCURRENCY = 3
+
+# Pace requests a little below Notion's ~3 req/s limit to avoid 429/502 cascades
+NOTION_RATE = 2.5
+NOTION_BURST = 3
+
+# Below this similarity between old and new blocks, replace the page wholesale
+DIFF_MIN_RATIO = 0.2
+
+# Retry policy for transient Notion failures (rate limiting and gateway errors).
+# Writes (POST/PATCH) may already have been applied after a gateway error or a
+# dropped connection, so they are only retried when Notion cannot have seen them.
+RETRY_STATUSES = {429, 502, 503, 504}
+WRITE_RETRY_STATUSES = {429}
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+RETRY_ERRORS = CONNECT_ERRORS + (httpx.RemoteProtocolError,)
+IDEMPOTENT_METHODS = {"GET", "DELETE"}
+MAX_RETRIES = 6
+BACKOFF_FACTOR = 1.5
+
+
+def _retry_delay(attempt: int, response=None) -> float:
+    """
+    Seconds to wait before retrying after the given (0-based) attempt.
+    Honors Notion's Retry-After header, otherwise backs off exponentially.
+    Jitter keeps concurrent clients from retrying in lockstep.
+    """
+    jitter = random.uniform(0, 0.5)
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after) + jitter
+        except ValueError:
+            pass
+    return BACKOFF_FACTOR * (2 ** attempt) + jitter
+
+
+def _plan_retry(method: str, attempt: int, response=None, error=None):
+    """
+    Decide whether to retry a Notion request after the given (0-based) attempt,
+    which either returned `response` or raised `error`.
+    Logs and returns the delay in seconds before retrying, or None if the
+    response should be returned (or the error raised) as-is.
+    POST and PATCH are only retried on 429 and connect-phase errors.
+    """
+    if attempt >= MAX_RETRIES:
+        return None
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    if error is not None:
+        retry_errors = RETRY_ERRORS if idempotent else CONNECT_ERRORS
+        retry, reason = isinstance(error, retry_errors), "connection error"
+    else:
+        retry_statuses = RETRY_STATUSES if idempotent else WRITE_RETRY_STATUSES
+        retry, reason = response.status_code in retry_statuses, response.status_code
+    if not retry:
+        return None
+
+    delay = _retry_delay(attempt, response)
+    print(f"Notion {method} failed ({reason}), retrying in {delay:.1f}s...")
+    return delay
+
+
+class TokenBucket:
+    """
+    Client-side rate limiter allowing bursts of up to `capacity` requests,
+    refilled at `rate` tokens per second. Safe to share across threads.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token and return how long to wait until it is available."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self):
+        time.sleep(self._reserve())
+
+    async def acquire_async(self):
+        await asyncio.sleep(self._reserve())
+
+
+# Shared by every Notion request, sync or async
+notion_rate_limit = TokenBucket(rate=NOTION_RATE, capacity=NOTION_BURST)
+
+
+class NotionClient(httpx.Client):
+    """
+    Pooled HTTP/2 client for the Notion API that paces requests through the
+    shared rate limiter and retries transient failures.
+    Responses are returned as-is once they succeed or retries run out,
+    so callers still decide when to raise_for_status().
+    """
+
+    def __init__(self):
+        super().__init__(
+            http2=True,
+            headers=NOTION_HDRS,
+            timeout=NOTION_TIMEOUT,
+            limits=httpx.Limits(max_keepalive_connections=4),
+        )
+
+    def request(self, method, url, **kwargs):
+        attempt = 0
+        while True:
+            notion_rate_limit.acquire()
+            try:
+                r, error = super().request(method, url, **kwargs), None
+            except httpx.TransportError as e:
+                r, error = None, e
+
+            delay = _plan_retry(method, attempt, r, error)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return r
+            time.sleep(delay)
+            attempt += 1
+
+
+notion = NotionClient()
+atexit.register(notion.close)
+
 openai_client = OpenAI(api_key=TRM_OPEN_AI_KEY)
 
+# Local cache directory (restored and saved by the workflow, even when the job fails)
+CACHE_DIR = Path(os.environ.get("NOTION_SYNC_CACHE_DIR", "~/.cache/notion_sync")).expanduser()
+LLM_CACHE_TTL = 7 * 24 * 60 * 60  # 7 days, in seconds
+
+
+class LLMCache:
+    """
+    Persistent SQLite cache of OpenAI responses.
+    Entries are keyed by a SHA256 of the full request and stored gzip-compressed.
+    """
+
+    def __init__(self, path: Path, ttl: float = LLM_CACHE_TTL):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, response BLOB, ts REAL)"
+        )
+
+    @staticmethod
+    def key(request: dict) -> str:
+        """Deterministic cache key for a chat completion request."""
+        payload = orjson.dumps(request, option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, key: str):
+        """Return the cached response for key, or None if missing or expired."""
+        row = self.conn.execute(
+            "SELECT response, ts FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return gzip.decompress(row[0]).decode()
+
+    def set(self, key: str, response: str):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, ts) VALUES (?, ?, ?)",
+                (key, gzip.compress(response.encode()), time.time()),
+            )
+
+
+llm_cache = LLMCache(CACHE_DIR / "llm.sqlite")
+
+# Signature of the last PR synced to each page, keyed by page ID
+SYNC_STATE_PATH = CACHE_DIR / "sync_state.json"
+
+
+def load_sync_state() -> dict:
+    """Load the last-synced signature per page, or an empty state on first run."""
+    try:
+        return orjson.loads(SYNC_STATE_PATH.read_bytes())
+    except FileNotFoundError:
+        return {}
+
+
+def save_sync_state(state: dict):
+    SYNC_STATE_PATH.write_bytes(orjson.dumps(state, option=orjson.OPT_INDENT_2))
+
+
+def sync_signature(pr_info: dict, page_id: str) -> str:
+    """Hash of everything from the PR that feeds into a page update."""
+    payload = f"{pr_info['title']}\0{pr_info['body']}\0{page_id}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
 PAGE_ID_RE = re.compile(r"(?:notion\.so|notion\.site)/[^\s#?]*?([0-9a-fA-F]{32})")
 
-# Load prefix-to-page mapping from config file
+UUID_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.IGNORECASE)
+
+_PAGE_MAPPING = None
+
+
+# Load prefix-to-page mapping from config file (read once per process)
 def load_page_mapping():
-    with open("page_mapping.json", "r") as f:
-        return json.load(f)
+    global _PAGE_MAPPING
+    if _PAGE_MAPPING is None:
+        with open("page_mapping.json", "rb") as f:
+            _PAGE_MAPPING = orjson.loads(f.read())
+    return _PAGE_MAPPING
 
 
 def load_pr():
     """Load PR information from GitHub event."""
-    with open(EVENT_PATH, "r") as f:
-        ev = json.load(f)
+    with open(EVENT_PATH, "rb") as f:
+        ev = orjson.loads(f.read())
     pr = ev["pull_request"]
     return {
         "title": pr["title"],
@@ -79,6 +302,9 @@ def format_page_id(page_id: str) -> str:
     Format page ID to Notion's expected format (8-4-4-4-12).
     If already formatted, return as is.
     """
+    if len(page_id) == 36 and UUID_RE.match(page_id):
+        return page_id.lower()
+
     # Remove any existing hyphens
     clean_id = page_id.replace("-", "").lower()
     if len(clean_id) != 32:
@@ -86,65 +312,173 @@ def format_page_id(page_id: str) -> str:
     return f"{clean_id[0:8]}-{clean_id[8:12]}-{clean_id[12:16]}-{clean_id[16:20]}-{clean_id[20:32]}"
 
 
-def get_notion_page_content(page_id: str) -> str:
+def _fetch_children_page(block_id: str, start_cursor: str = None) -> dict:
+    """Fetch one page (up to 100) of a block's children."""
+    params = {"page_size": 100}
+    if start_cursor:
+        params["start_cursor"] = start_cursor
+
+    r = notion.get(f"{BASE}/blocks/{block_id}/children", params=params)
+    r.raise_for_status()
+    return orjson.loads(r.content)
+
+
+def _iter_children(block_id: str):
     """
-    Retrieve all block content from a Notion page.
-    Returns the content as formatted text.
+    Yield every child block of a block or page, following pagination.
+    Blocks are streamed one API page at a time, so callers never hold them all.
+    The next page is prefetched in the background while the caller consumes
+    the current one.
     """
-    blocks = []
-    has_more = True
-    start_cursor = None
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        data = _fetch_children_page(block_id)
+        while True:
+            next_page = None
+            if data.get("has_more"):
+                next_page = executor.submit(_fetch_children_page, block_id, data.get("next_cursor"))
 
-    while has_more:
-        url = f"{BASE}/blocks/{page_id}/children"
-        params = {"page_size": 100}
-        if start_cursor:
-            params["start_cursor"] = start_cursor
+            yield from data.get("results", [])
+
+            if next_page is None:
+                return
+            data = next_page.result()
 
-        r = requests.get(url, headers=NOTION_HDRS, params=params)
-        r.raise_for_status()
-        data = r.json()
 
-        blocks.extend(data.get("results", []))
-        has_more = data.get("has_more", False)
-        start_cursor = data.get("next_cursor")
+def _is_spec_root(block: dict) -> bool:
+    """
+    Whether a top-level block is the spec root container.
+    Synced pages keep all of their content inside a single original synced block
+    so the whole spec can be replaced by archiving one block.
+    """
+    return block.get("type") == "synced_block" and block["synced_block"].get("synced_from") is None
+
+
+def _rich_text_to_markdown(rich_text: list) -> str:
+    """Render Notion rich text as markdown, keeping inline formatting and links."""
+    parts = []
+    for rt in rich_text:
+        text = rt.get("plain_text", "")
+        annotations = rt.get("annotations", {})
+        if annotations.get("code"):
+            text = f"`{text}`"
+        if annotations.get("italic"):
+            text = f"*{text}*"
+        if annotations.get("bold"):
+            text = f"**{text}**"
+        if annotations.get("strikethrough"):
+            text = f"~~{text}~~"
+        if rt.get("href"):
+            text = f"[{text}]({rt['href']})"
+        parts.append(text)
+    return "".join(parts)
+
+
+def _block_to_text(block: dict):
+    """Render a single Notion block as a line of markdown, or None if it has no text."""
+    block_type = block.get("type")
+    if not block_type:
+        return None
+
+    block_data = block.get(block_type, {})
+    rich_text = block_data.get("rich_text", [])
+
+    if block_type == "divider":
+        return "---"
+    if not rich_text:
+        return None
+
+    text = _rich_text_to_markdown(rich_text)
+    if block_type == "heading_1":
+        return f"# {text}"
+    elif block_type == "heading_2":
+        return f"## {text}"
+    elif block_type == "heading_3":
+        return f"### {text}"
+    elif block_type == "bulleted_list_item":
+        return f"• {text}"
+    elif block_type == "numbered_list_item":
+        return f"1. {text}"
+    elif block_type == "quote":
+        return f"> {text}"
+    elif block_type == "code":
+        return f"```\n{text}\n```"
+    return text
+
+
+def get_notion_page_content(page_id: str) -> tuple:
+    """
+    Retrieve all block content from a Notion page.
+    Returns the content as formatted text, the spec root id (None if the page
+    has no spec root yet) and an (id, signature) pair per content block.
+    Blocks are converted as they stream in rather than kept in memory.
+    """
+    blocks = _iter_children(page_id)
+    first = next(blocks, None)
+    root_id = None
+    if first and _is_spec_root(first):
+        root_id = first["id"]
+        blocks = _iter_children(root_id)
+    elif first:
+        blocks = itertools.chain([first], blocks)
 
-    # Convert blocks to text
     content_parts = []
+    existing_blocks = []
     for block in blocks:
-        block_type = block.get("type")
-        if not block_type:
-            continue
+        existing_blocks.append((block["id"], _block_signature(block)))
+        text = _block_to_text(block)
+        if text is not None:
+            content_parts.append(text)
 
-        block_data = block.get(block_type, {})
-        rich_text = block_data.get("rich_text", [])
-        
-        if rich_text:
-            text = "".join([rt.get("plain_text", "") for rt in rich_text])
-            if block_type == "heading_1":
-                content_parts.append(f"# {text}")
-            elif block_type == "heading_2":
-                content_parts.append(f"## {text}")
-            elif block_type == "heading_3":
-                content_parts.append(f"### {text}")
-            elif block_type == "bulleted_list_item":
-                content_parts.append(f"• {text}")
-            elif block_type == "numbered_list_item":
-                content_parts.append(f"1. {text}")
-            else:
-                content_parts.append(text)
+    return "\n".join(content_parts), root_id, existing_blocks
+
+
+# Output budget bounds for synthesis, in tokens
+MIN_MAX_TOKENS = 800
+MAX_MAX_TOKENS = 4000
+
+
+def estimate_max_tokens(existing_content: str, pr_body: str) -> int:
+    """
+    Size the completion budget to the expected output rather than the worst case.
+    The updated page is roughly the existing page plus the PR, at ~4 UTF-8 bytes
+    per token (counting bytes rather than characters keeps non-English text,
+    which needs more tokens per character, from being underestimated).
+    Truncated responses are retried with MAX_MAX_TOKENS by synthesize_with_openai.
+    """
+    estimate = len(existing_content.encode()) // 4 + len(pr_body.encode()) // 4
+    return max(MIN_MAX_TOKENS, min(MAX_MAX_TOKENS, int(1.25 * estimate) + 500))
+
+
+# Static instructions go first so OpenAI's prompt cache can reuse the prefix across runs
+SYSTEM_PROMPT = """You are a technical documentation assistant that helps maintain specification documents.
+
+You are helping to update a technical specification document in Notion based on a GitHub Pull Request.
+The user message contains the existing Notion page content followed by the pull request information.
+
+TASK:
+Synthesize and update the Notion page content by intelligently merging the PR information with the existing content.
 
-    return "\n".join(content_parts)
+Guidelines:
+1. Integrate the PR updates appropriately:
+   - Update relevant sections if the PR modifies existing components
+   - Add new sections for new components
+   - Maintain the overall document structure and flow
+2. Include a "Recent Updates" or "Change Log" section that mentions this PR
+3. Use clear markdown formatting with proper headings, lists, and emphasis
+4. Be concise but comprehensive
+5. Don't duplicate information unnecessarily
+6. Link to the PR in the main body of the page if it would provide useful context
+
+Return ONLY the updated page content in Notion markdown format"""
 
 
-def synthesize_with_openai(existing_content: str, pr_info: dict) -> str:
+def synthesize_with_openai(existing_content: str, pr_info: dict, page_id: str) -> str:
     """
     Use OpenAI to synthesize the existing Notion page content with the PR body.
     Returns the synthesized content in markdown format.
     """
-    prompt = f"""You are helping to update a technical specification document in Notion based on a GitHub Pull Request.
-
-EXISTING NOTION PAGE CONTENT:
+    # Per-PR variables go last, after the cacheable system prefix
+    prompt = f"""EXISTING NOTION PAGE CONTENT:
 {existing_content if existing_content.strip() else "(Page is currently empty)"}
 
 PULL REQUEST INFORMATION:
@@ -154,146 +488,336 @@ PULL REQUEST INFORMATION:
 - PR #{pr_info['number']}: {pr_info['url']}
 
 PR DESCRIPTION:
-{pr_info['body'] if pr_info['body'].strip() else "(No description provided)"}
+{pr_info['body'] if pr_info['body'].strip() else "(No description provided)"}"""
 
-TASK:
-Synthesize and update the Notion page content by intelligently merging the PR information with the existing content. 
-
-Guidelines:
-Integrate the PR updates appropriately:
-   - Update relevant sections if the PR modifies existing components
-   - Add new sections for new components
-   - Maintain the overall document structure and flow
-3. Include a "Recent Updates" or "Change Log" section that mentions this PR
-4. Use clear markdown formatting with proper headings, lists, and emphasis
-5. Be concise but comprehensive
-6. Don't duplicate information unnecessarily
-7. Link to the PR in the main body of the page if it would provide useful context
-
-Return ONLY the updated page content in Notionmarkdown format"""
-
-    response = openai_client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {
-                "role": "system",
-                "content": "You are a technical documentation assistant that helps maintain specification documents.",
-            },
+    # temperature=0 keeps identical requests deterministic, so cached responses stay valid
+    request = {
+        "model": "gpt-4o",
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt},
         ],
-        temperature=0.7,
-        max_tokens=4000,
-    )
+        "temperature": 0,
+        "max_tokens": estimate_max_tokens(existing_content, pr_info["body"]),
+        # Route repeat syncs of the same page to the same prompt cache shard
+        "extra_body": {"prompt_cache_key": page_id},
+    }
+
+    key = LLMCache.key(request)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        print("Using cached OpenAI response")
+        return cached
+
+    response = openai_client.chat.completions.create(**request)
+    choice = response.choices[0]
+    if choice.finish_reason == "length" and request["max_tokens"] < MAX_MAX_TOKENS:
+        # The estimated budget was too small; retry once with the full budget
+        print(f"OpenAI response hit max_tokens={request['max_tokens']}, retrying with {MAX_MAX_TOKENS}...")
+        response = openai_client.chat.completions.create(**{**request, "max_tokens": MAX_MAX_TOKENS})
+        choice = response.choices[0]
+    if choice.finish_reason == "length":
+        # Writing back a truncated page would drop the tail of the spec
+        raise RuntimeError(
+            f"OpenAI response was truncated at {MAX_MAX_TOKENS} tokens; not updating the page"
+        )
+
+    content = choice.message.content
+    llm_cache.set(key, content)
+    return content
+
+
+MARKDOWN = MarkdownIt("commonmark").enable("strikethrough")
 
-    return response.choices[0].message.content
+# Existing page content is rendered with "•" bullets, which markdown doesn't recognise
+BULLET_RE = re.compile(r"^(\s*)• ", re.MULTILINE)
+
+# Notion rejects rich text runs longer than this many characters
+NOTION_TEXT_LIMIT = 2000
+
+# Inline markup mapped to Notion rich text annotations
+INLINE_ANNOTATIONS = {"strong": "bold", "em": "italic", "s": "strikethrough"}
+
+# Enclosing markdown containers mapped to the Notion block type of their text
+CONTAINER_TYPES = {
+    "bullet_list": "bulleted_list_item",
+    "ordered_list": "numbered_list_item",
+    "blockquote": "quote",
+}
+
+# Block tokens that end the chance for a list item's text to start it
+ITEM_CLOSING_TOKENS = {"list_item_close", "heading_open", "fence", "code_block", "hr", "html_block"}
+
+# Fenced code languages passed through to Notion; anything else is "plain text"
+CODE_LANGUAGES = {
+    "bash", "c", "c++", "css", "go", "html", "java", "javascript", "json",
+    "markdown", "python", "ruby", "rust", "shell", "sql", "typescript", "yaml",
+}
+
+
+def _append_text(rich_text: list, content: str, marks: set, link: str = None):
+    """
+    Append a text run, merging it into the previous run if formatting matches.
+    Runs are split at Notion's per-run character limit.
+    """
+    annotations = {mark: True for mark in sorted(marks)}
+    link = {"url": link} if link else None
+    while content:
+        if rich_text:
+            prev = rich_text[-1]
+            room = NOTION_TEXT_LIMIT - len(prev["text"]["content"])
+            if room > 0 and prev.get("annotations", {}) == annotations and prev["text"].get("link") == link:
+                prev["text"]["content"] += content[:room]
+                content = content[room:]
+                continue
+
+        text = {"content": content[:NOTION_TEXT_LIMIT]}
+        if link:
+            text["link"] = link
+        run = {"type": "text", "text": text}
+        if annotations:
+            run["annotations"] = annotations
+        rich_text.append(run)
+        content = content[NOTION_TEXT_LIMIT:]
+
+
+def _plain_rich_text(content: str) -> list:
+    """Unformatted Notion rich text for content, split at the per-run limit."""
+    rich_text = []
+    _append_text(rich_text, content, set())
+    return rich_text
+
+
+def _inline_to_rich_text(inline) -> list:
+    """Convert an inline markdown token to Notion rich text, keeping bold/italic/code/links."""
+    rich_text = []
+    marks = set()
+    link = None
+    for token in inline.children or []:
+        name = token.type.rsplit("_", 1)[0]
+        if name in INLINE_ANNOTATIONS:
+            if token.nesting == 1:
+                marks.add(INLINE_ANNOTATIONS[name])
+            else:
+                marks.discard(INLINE_ANNOTATIONS[name])
+        elif token.type == "link_open":
+            # Notion rejects relative and non-web URLs
+            href = token.attrs.get("href", "")
+            link = href if href.startswith(("http://", "https://")) else None
+        elif token.type == "link_close":
+            link = None
+        elif token.type in ("softbreak", "hardbreak"):
+            _append_text(rich_text, "\n", marks, link)
+        elif token.type == "code_inline":
+            _append_text(rich_text, token.content, marks | {"code"}, link)
+        else:
+            _append_text(rich_text, token.content, marks, link)
+    return rich_text
+
+
+def _block(block_type: str, **data) -> dict:
+    """Build a Notion block of the given type."""
+    return {"object": "block", "type": block_type, block_type: data}
 
 
 def markdown_to_notion_blocks(markdown: str) -> list:
     """
     Convert markdown text to Notion block format.
-    This is a simplified converter - you may want to enhance it for complex markdown.
+    Headings, lists, quotes, code and dividers become blocks; bold, italic,
+    strikethrough, inline code and links become rich text annotations.
+    Nested lists are flattened, since Notion limits nesting per request.
     """
     blocks = []
-    lines = markdown.split("\n")
-    
-    for line in lines:
-        line = line.rstrip()
-        
-        if not line:
-            continue
-            
-        # Heading 1
-        if line.startswith("# "):
-            blocks.append({
-                "object": "block",
-                "type": "heading_1",
-                "heading_1": {
-                    "rich_text": [{"type": "text", "text": {"content": line[2:]}}]
-                }
-            })
-        # Heading 2
-        elif line.startswith("## "):
-            blocks.append({
-                "object": "block",
-                "type": "heading_2",
-                "heading_2": {
-                    "rich_text": [{"type": "text", "text": {"content": line[3:]}}]
-                }
-            })
-        # Heading 3
-        elif line.startswith("### "):
-            blocks.append({
-                "object": "block",
-                "type": "heading_3",
-                "heading_3": {
-                    "rich_text": [{"type": "text", "text": {"content": line[4:]}}]
-                }
-            })
-        # Bulleted list
-        elif line.startswith("- ") or line.startswith("• "):
-            blocks.append({
-                "object": "block",
-                "type": "bulleted_list_item",
-                "bulleted_list_item": {
-                    "rich_text": [{"type": "text", "text": {"content": line[2:]}}]
-                }
-            })
-        # Numbered list
-        elif re.match(r"^\d+\.\s", line):
-            content = re.sub(r"^\d+\.\s", "", line)
-            blocks.append({
-                "object": "block",
-                "type": "numbered_list_item",
-                "numbered_list_item": {
-                    "rich_text": [{"type": "text", "text": {"content": content}}]
-                }
-            })
-        # Regular paragraph
-        else:
-            # Handle bold **text** and italic *text* (simplified)
-            blocks.append({
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [{"type": "text", "text": {"content": line}}]
-                }
-            })
-    
+    containers = []
+    heading = None
+    item_open = False
+
+    for token in MARKDOWN.parse(BULLET_RE.sub(r"\1- ", markdown)):
+        kind = token.type.rsplit("_", 1)[0]
+        if token.type in ITEM_CLOSING_TOKENS:
+            # Only inline text directly opening a list item becomes the list item;
+            # an empty item or one starting with a heading/code/divider does not
+            item_open = False
+
+        if token.type == "heading_open":
+            # Notion only has three heading levels
+            heading = f"heading_{min(int(token.tag[1]), 3)}"
+        elif kind in CONTAINER_TYPES:
+            if token.nesting == 1:
+                containers.append(CONTAINER_TYPES[kind])
+            else:
+                containers.pop()
+        elif token.type == "list_item_open":
+            item_open = True
+        elif token.type == "inline":
+            if heading:
+                block_type, heading = heading, None
+            elif item_open and containers:
+                block_type, item_open = containers[-1], False
+            elif containers and containers[-1] == "quote":
+                block_type = "quote"
+            else:
+                block_type = "paragraph"
+            blocks.append(_block(block_type, rich_text=_inline_to_rich_text(token)))
+        elif token.type in ("fence", "code_block"):
+            language = token.info.strip().lower() or "plain text"
+            blocks.append(_block(
+                "code",
+                rich_text=_plain_rich_text(token.content.rstrip("\n")),
+                language=language if language in CODE_LANGUAGES else "plain text",
+            ))
+        elif token.type == "hr":
+            blocks.append(_block("divider"))
+        elif token.type == "html_block":
+            blocks.append(_block("paragraph", rich_text=_plain_rich_text(token.content.rstrip())))
+
     return blocks
 
 
+async def _delete_blocks(block_ids: list):
+    """Delete blocks concurrently over a shared HTTP/2 connection."""
+    limits = httpx.Limits(max_connections=8)
+    async with httpx.AsyncClient(
+        http2=True, headers=NOTION_HDRS, timeout=NOTION_TIMEOUT, limits=limits
+    ) as client:
+        sem = asyncio.Semaphore(NOTION_CONCURRENCY)
+
+        async def delete_one(block_id: str):
+            async with sem:
+                attempt = 0
+                while True:
+                    await notion_rate_limit.acquire_async()
+                    try:
+                        r, error = await client.delete(f"{BASE}/blocks/{block_id}"), None
+                    except httpx.TransportError as e:
+                        r, error = None, e
+
+                    delay = _plan_retry("DELETE", attempt, r, error)
+                    if delay is None:
+                        break
+                    await asyncio.sleep(delay)
+                    attempt += 1
+
+                if error is not None:
+                    raise error
+                r.raise_for_status()
+
+        await asyncio.gather(*(delete_one(block_id) for block_id in block_ids))
+
+
 def delete_all_blocks(page_id: str):
-    """Delete all existing blocks from a Notion page."""
-    # Get all blocks
-    r = requests.get(f"{BASE}/blocks/{page_id}/children", headers=NOTION_HDRS)
-    r.raise_for_status()
-    blocks = r.json().get("results", [])
-    
-    # Delete each block
-    for block in blocks:
-        block_id = block["id"]
-        requests.delete(f"{BASE}/blocks/{block_id}", headers=NOTION_HDRS)
+    """
+    Delete all existing top-level blocks from a Notion page.
+    For pages already holding a spec root this is a single DELETE, since
+    archiving a block archives all of its children.
+    """
+    # Get all blocks (not just the first 100)
+    block_ids = [block["id"] for block in _iter_children(page_id)]
+
+    # Delete blocks in parallel, bounded by Notion's rate limit
+    asyncio.run(_delete_blocks(block_ids))
+
 
+def _block_signature(block: dict) -> str:
+    """
+    Hash of a block's type and formatted text.
+    Comparable between blocks fetched from Notion and blocks built locally.
+    """
+    block_type = block.get("type")
+    parts = []
+    for rt in block.get(block_type, {}).get("rich_text", []):
+        text = rt.get("plain_text", rt.get("text", {}).get("content", ""))
+        link = rt.get("href") or (rt.get("text", {}).get("link") or {}).get("url")
+        marks = sorted(k for k, v in rt.get("annotations", {}).items() if v and v != "default")
+        parts.append([text, link, marks])
+    return hashlib.sha256(orjson.dumps([block_type, parts])).hexdigest()
 
-def update_notion_page(page_id: str, new_blocks: list):
+
+def _append_children(parent_id: str, blocks: list, after: str = None):
+    """
+    Append blocks to a parent in batches (Notion has a 100 block limit per request).
+    If `after` is given, the blocks are inserted after that child instead of at the end.
+    Returns the id of the last block created.
+    """
+    batch_size = 100
+    for i in range(0, len(blocks), batch_size):
+        payload = {"children": blocks[i:i + batch_size]}
+        if after:
+            payload["after"] = after
+        r = notion.patch(f"{BASE}/blocks/{parent_id}/children", content=orjson.dumps(payload))
+        r.raise_for_status()
+        after = orjson.loads(r.content)["results"][-1]["id"]
+    return after
+
+
+def patch_changed_blocks(root_id: str, existing_blocks: list, new_blocks: list) -> bool:
+    """
+    Update the spec root in place, touching only the blocks that changed.
+    `existing_blocks` holds the (id, signature) pairs from get_notion_page_content.
+    Returns False without writing anything if too little content matches
+    for an incremental update to be worthwhile.
+    """
+    old_sigs = [sig for _, sig in existing_blocks]
+    new_sigs = [_block_signature(block) for block in new_blocks]
+    matcher = difflib.SequenceMatcher(None, old_sigs, new_sigs, autojunk=False)
+    if existing_blocks and matcher.ratio() < DIFF_MIN_RATIO:
+        return False
+
+    to_delete = []
+    # Anchors that were replaced, mapped to the last block inserted after them
+    moved_anchors = {}
+    inserted = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        # Notion can only insert after an existing child, so an insertion at the
+        # very top also replaces the first block to have something to anchor to
+        if i2 == 0 and existing_blocks:
+            i2, j2 = 1, j2 + 1
+        to_delete.extend(block_id for block_id, _ in existing_blocks[i1:i2])
+        if j2 > j1:
+            anchor = existing_blocks[i2 - 1][0] if i2 else None
+            last_id = _append_children(root_id, new_blocks[j1:j2], after=moved_anchors.get(anchor, anchor))
+            if anchor:
+                moved_anchors[anchor] = last_id
+            inserted += j2 - j1
+
+    print(f"Inserted {inserted} blocks, deleting {len(to_delete)} outdated blocks...")
+    asyncio.run(_delete_blocks(to_delete))
+    return True
+
+
+def update_notion_page(page_id: str, new_blocks: list, root_id: str = None, existing_blocks: list = ()):
     """
     Replace the content of a Notion page with new blocks.
+    If the page already has a spec root, only the changed blocks are rewritten.
     """
+    if root_id:
+        print(f"Diffing {len(existing_blocks)} existing blocks against {len(new_blocks)} new blocks...")
+        if patch_changed_blocks(root_id, existing_blocks, new_blocks):
+            print("✅ Notion page updated successfully!")
+            return
+        print("Content changed too much for an incremental update, replacing it...")
+
     # Delete existing content
     print(f"Clearing existing content from page {page_id}...")
     delete_all_blocks(page_id)
     
-    # Add new content in batches (Notion has a 100 block limit per request)
+    # Add new content inside a fresh spec root (Notion has a 100 block limit per request)
     print(f"Adding {len(new_blocks)} new blocks...")
     batch_size = 100
-    for i in range(0, len(new_blocks), batch_size):
-        batch = new_blocks[i:i + batch_size]
-        r = requests.patch(
-            f"{BASE}/blocks/{page_id}/children",
-            headers=NOTION_HDRS,
-            json={"children": batch}
-        )
-        r.raise_for_status()
+    root = {
+        "object": "block",
+        "type": "synced_block",
+        "synced_block": {"synced_from": None, "children": new_blocks[:batch_size]},
+    }
+    r = notion.patch(
+        f"{BASE}/blocks/{page_id}/children",
+        content=orjson.dumps({"children": [root]})
+    )
+    r.raise_for_status()
+    root_id = orjson.loads(r.content)["results"][0]["id"]
+    _append_children(root_id, new_blocks[batch_size:])
     
     print("✅ Notion page updated successfully!")
 
@@ -352,11 +876,11 @@ def add_pr_to_database(database_id: str, pr_info: dict, prefix: str):
         "properties": properties
     }
     
-    r = requests.post(f"{BASE}/pages", headers=NOTION_HDRS, json=payload)
+    r = notion.post(f"{BASE}/pages", content=orjson.dumps(payload))
     r.raise_for_status()
     
     print(f"✅ Added PR to database: {pr_info['title']}")
-    return r.json()["id"]
+    return orjson.loads(r.content)["id"]
 
 
 def check_pr_exists_in_database(database_id: str, pr_url: str) -> bool:
@@ -372,13 +896,33 @@ def check_pr_exists_in_database(database_id: str, pr_url: str) -> bool:
         "page_size": 1
     }
     
-    r = requests.post(f"{BASE}/databases/{database_id}/query", headers=NOTION_HDRS, json=payload)
+    r = notion.post(f"{BASE}/databases/{database_id}/query", content=orjson.dumps(payload))
     r.raise_for_status()
     
-    results = r.json().get("results", [])
+    results = orjson.loads(r.content).get("results", [])
     return len(results) > 0
 
 
+def sync_page(page_id: str, pr_info: dict):
+    """Fetch the page, synthesize updated content with OpenAI and write it back."""
+    # Get existing page content
+    print("Fetching existing Notion page content...")
+    existing_content, root_id, existing_blocks = get_notion_page_content(page_id)
+    print(f"Retrieved {len(existing_content)} characters of existing content")
+
+    # Synthesize with OpenAI
+    print("Synthesizing content with OpenAI...")
+    synthesized_content = synthesize_with_openai(existing_content, pr_info, page_id)
+    print(f"Generated {len(synthesized_content)} characters of new content")
+
+    # Convert to Notion blocks
+    print("Converting markdown to Notion blocks...")
+    new_blocks = markdown_to_notion_blocks(synthesized_content)
+
+    # Update Notion page
+    update_notion_page(page_id, new_blocks, root_id, existing_blocks)
+
+
 def main():
     print("Starting Notion sync with AI synthesis...")
     
@@ -399,22 +943,16 @@ def main():
     page_id = format_page_id(page_id)
     print(f"Target Notion page: {page_id}")
     
-    # Get existing page content
-    print("Fetching existing Notion page content...")
-    existing_content = get_notion_page_content(page_id)
-    print(f"Retrieved {len(existing_content)} characters of existing content")
-    
-    # Synthesize with OpenAI
-    print("Synthesizing content with OpenAI...")
-    synthesized_content = synthesize_with_openai(existing_content, pr_info)
-    print(f"Generated {len(synthesized_content)} characters of new content")
-    
-    # Convert to Notion blocks
-    print("Converting markdown to Notion blocks...")
-    new_blocks = markdown_to_notion_blocks(synthesized_content)
-    
-    # Update Notion page
-    update_notion_page(page_id, new_blocks)
+    # Skip the fetch/synthesize/rewrite chain if this PR was already synced to the page
+    signature = sync_signature(pr_info, page_id)
+    sync_state = load_sync_state()
+    skipped = sync_state.get(page_id) == signature
+    if skipped:
+        print("No changes since last sync; skipping page update.")
+    else:
+        sync_page(page_id, pr_info)
+        sync_state[page_id] = signature
+        save_sync_state(sync_state)
     
     # Add PR to tracking database (if configured)
     if PR_DATABASE_ID:
@@ -426,7 +964,10 @@ def main():
     else:
         print("ℹ️  No PR database configured (NOTION_PR_DATABASE_ID not set)")
     
-    print(f"🎉 Successfully updated Notion page for PR #{pr_info['number']}")
+    if skipped:
+        print(f"🎉 Notion page already up to date for PR #{pr_info['number']}")
+    else:
+        print(f"🎉 Successfully updated Notion page for PR #{pr_info['number']}")
 
 
 if __name__ == "__main__":
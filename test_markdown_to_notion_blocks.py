@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+# sync_notion_with_ai reads its configuration from the environment at import time
+os.environ.setdefault("NOTION_API_KEY", "test")
+os.environ.setdefault("TRM_OPEN_AI_KEY", "test")
+os.environ.setdefault("GITHUB_EVENT_PATH", "event.json")
+os.environ.setdefault("NOTION_SYNC_CACHE_DIR", tempfile.mkdtemp())
+
+import pytest
+
+from sync_notion_with_ai import markdown_to_notion_blocks
+
+
+def summarize(blocks):
+    """Reduce blocks to (type, text) pairs."""
+    return [
+        (block["type"], "".join(rt["text"]["content"] for rt in block[block["type"]].get("rich_text", [])))
+        for block in blocks
+    ]
+
+
+@pytest.mark.parametrize(
+    "markdown, expected",
+    [
+        # List items whose first child is not inline text
+        ("-\n\nparagraph", [("paragraph", "paragraph")]),
+        ("- ```\n  code\n  ```\n\nafter", [("code", "code"), ("paragraph", "after")]),
+        ("- # Head\n\nafter", [("heading_1", "Head"), ("paragraph", "after")]),
+    ],
+)
+def test_list_item_without_leading_text(markdown, expected):
+    assert summarize(markdown_to_notion_blocks(markdown)) == expected
+
+
+def test_list_items_and_paragraph():
+    blocks = markdown_to_notion_blocks("- a\n- b\n\nc")
+    assert summarize(blocks) == [
+        ("bulleted_list_item", "a"),
+        ("bulleted_list_item", "b"),
+        ("paragraph", "c"),
+    ]